@@ -6,56 +6,104 @@ import logging
 import uvicorn
 import time
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from datetime import datetime
+from types import MappingProxyType
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from starlette.datastructures import MutableHeaders
+from anyio import to_thread
 
 from app.routes.predict import router as predict_router
 from app.utils.helpers import setup_logging, get_config, HealthChecker
-from app.services.queue import get_queue_service
+from app.services.queue import get_queue_service, REDIS_URL
 
-# Setup logging
-setup_logging()
+# Use uvloop as the event loop when available (not supported on Windows)
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+# Setup logging (records are written by a listener thread, restarted and stopped in lifespan)
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
 # Load configuration
 config = get_config()
 
+THREADPOOL_SIZE = 200
+
+# Static part of the Redis section in /health, resolved once at startup
+_REDIS_HEALTH_INFO = MappingProxyType({"url": REDIS_URL})
+
+# Timestamp cache shared by the monitoring and error responses: [epoch second, iso string]
+_ts_cache = [0, ""]
+
+
+def _now_iso() -> str:
+    """Return the current UTC time as an ISO string, formatted at most once per second."""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = datetime.utcfromtimestamp(t).isoformat()
+    return _ts_cache[1]
+
+
+# Monitoring and documentation paths that bypass request logging
+_SKIP_PATHS = frozenset({"/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/"})
+
+
+class RequestLoggingMiddleware:
+    """ASGI middleware for logging requests and response times."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in _SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        logger.info("Request: %s %s", scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                process_time = time.perf_counter() - start_time
+                # Copies the headers into a new list on the message before appending
+                MutableHeaders(scope=message).append("x-process-time", "%.3f" % process_time)
+                logger.info(
+                    "Response: %s - Processing time: %.3fs",
+                    message["status"], process_time
+                )
+            await send(message)
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware for logging requests and response times."""
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        logger.info(f"Request: {request.method} {request.url.path}")
         try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            logger.info(
-                f"Response: {response.status_code} - "
-                f"Processing time: {process_time:.3f}s"
-            )
-            response.headers["X-Process-Time"] = str(process_time)
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            process_time = time.time() - start_time
-            logger.error(f"Request failed after {process_time:.3f}s: {str(e)}")
+            process_time = time.perf_counter() - start_time
+            logger.error("Request failed after %.3fs: %s", process_time, e)
             raise
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler for startup and shutdown logic."""
+    # No-op on first startup; restarts the listener if a previous lifespan stopped it
+    log_listener.start()
     logger.info("Starting ZypherAI ML Prediction Platform")
     
     # Log environment variables for debugging
-    logger.info(f"REDIS_URL: {os.getenv('REDIS_URL', 'Not set')}")
-    logger.info(f"LOG_LEVEL: {os.getenv('LOG_LEVEL', 'Not set')}")
-    logger.info(f"CORS_ORIGINS: {os.getenv('CORS_ORIGINS', 'Not set')}")
+    logger.info("REDIS_URL: %s", os.getenv('REDIS_URL', 'Not set'))
+    logger.info("LOG_LEVEL: %s", os.getenv('LOG_LEVEL', 'Not set'))
+    logger.info("CORS_ORIGINS: %s", os.getenv('CORS_ORIGINS', 'Not set'))
+
+    # Allow more concurrent sync predictions in the threadpool (default is 40)
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
 
     # Initialize Redis connection with retry logic
     max_retries = 5
@@ -63,22 +111,19 @@ async def lifespan(app: FastAPI):
     
     for attempt in range(max_retries):
         try:
-            logger.info(f"Attempting to connect to Redis (attempt {attempt + 1}/{max_retries})")
+            logger.info("Attempting to connect to Redis (attempt %d/%d)", attempt + 1, max_retries)
             queue_service = get_queue_service()
             
-            # Test the connection
-            if queue_service.health_check():
-                queue_service.setup_consumer_group()
-                logger.info("Redis connection established and consumer group ready")
-                break
-            else:
-                raise Exception("Redis health check failed")
+            # Test the connection (raises if Redis is unreachable)
+            await queue_service.connect()
+            await queue_service.setup_consumer_group()
+            logger.info("Redis connection established and consumer group ready")
+            break
                 
         except Exception as e:
-            logger.error(f"Failed to connect to Redis (attempt {attempt + 1}): {e}")
+            logger.error("Failed to connect to Redis (attempt %d): %s", attempt + 1, e)
             if attempt < max_retries - 1:
-                logger.info(f"Retrying in {retry_delay} seconds...")
-                import asyncio
+                logger.info("Retrying in %d seconds...", retry_delay)
                 await asyncio.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
             else:
@@ -88,6 +133,7 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("Shutting down ZypherAI ML Prediction Platform")
+    log_listener.stop()
 
 
 # Initialize FastAPI application
@@ -116,7 +162,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Get CORS origins from environment
@@ -132,10 +179,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["localhost", "127.0.0.1", "0.0.0.0", "*"]
-)
+# Host checking is a no-op with a wildcard, so only add it when hosts are restricted
+allowed_hosts = config["allowed_hosts"]
+if "*" not in allowed_hosts:
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=allowed_hosts)
 app.add_middleware(RequestLoggingMiddleware)
 
 # Routes
@@ -145,23 +192,10 @@ app.include_router(predict_router)
 @app.get("/health", tags=["monitoring"], summary="Health Check")
 async def health_check():
     """Comprehensive health check including Redis connectivity."""
-    health_data = HealthChecker.get_system_health()
-    
-    # Add Redis health check
-    try:
-        queue_service = get_queue_service()
-        redis_healthy = queue_service.health_check()
-        health_data["redis"] = {
-            "status": "healthy" if redis_healthy else "unhealthy",
-            "url": os.getenv('REDIS_URL', 'redis://localhost:6379')
-        }
-    except Exception as e:
-        health_data["redis"] = {
-            "status": "error",
-            "error": str(e),
-            "url": os.getenv('REDIS_URL', 'redis://localhost:6379')
-        }
-    
+    health_data = await HealthChecker.get_system_health()
+    # Reuse the Redis probe from the system health check rather than pinging again
+    redis_healthy = health_data["services"]["redis"]
+    health_data["redis"] = {"status": "healthy" if redis_healthy else "unhealthy", **_REDIS_HEALTH_INFO}
     return health_data
 
 
@@ -169,9 +203,9 @@ async def health_check():
 async def get_metrics():
     from app.services.prediction import prediction_service
     return {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _now_iso(),
         "prediction_service": prediction_service.get_performance_metrics(),
-        "system": HealthChecker.get_system_health()
+        "system": await HealthChecker.get_system_health()
     }
 
 
@@ -187,21 +221,36 @@ async def root():
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content={"error": exc.detail, "timestamp": datetime.utcnow().isoformat()}
+        content={"error": exc.detail, "timestamp": _now_iso()}
     )
 
 
+# Pre-encoded body for the generic 500 response; only the timestamp varies
+_ERR_500_PREFIX = b'{"error":"Internal server error","timestamp":"'
+_ERR_500_SUFFIX = b'"}'
+
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    return JSONResponse(
-        status_code=500,
-        content={"error": "Internal server error", "timestamp": datetime.utcnow().isoformat()}
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
+    return Response(
+        content=_ERR_500_PREFIX + _now_iso().encode() + _ERR_500_SUFFIX,
+        media_type="application/json",
+        status_code=500
     )
 
 
-# Optional: For running locally outside Docker (not recommended inside container)
-# if __name__ == "__main__":
-#     uvicorn.run("app.main:app", host="0.0.0.0", port=8080, log_level=config["log_level"].lower())
\ No newline at end of file
+# Optional: For running locally outside Docker (the container uses the Dockerfile CMD)
+if __name__ == "__main__":
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8080,
+        loop="uvloop",
+        http="httptools",
+        ws="none",
+        log_level=config["log_level"].lower(),
+        access_log=False
+    )
\ No newline at end of file
@@ -2,8 +2,8 @@
 Used Pydantic models as data guards so that everything is structured and validated.
 """
 
-from pydantic import BaseModel, Field
-from typing import Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from typing import Annotated, Dict, Optional
 from enum import Enum
 
 
@@ -17,14 +17,17 @@ class PredictionStatus(str, Enum):
 
 class PredictionRequest(BaseModel):
     """Request model for prediction input."""
-    input: str = Field(..., min_length=1, max_length=10000, description="Input data for ML model prediction")
+    input: Annotated[
+        str, StringConstraints(strip_whitespace=True, min_length=1, max_length=10000)
+    ] = Field(..., description="Input data for ML model prediction")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "input": "Sample input data for the model"
             }
         }
+    )
 
 
 class SyncPredictionResponse(BaseModel):
@@ -32,13 +35,15 @@ class SyncPredictionResponse(BaseModel):
     input: str = Field(..., description="Original input data")
     result: str = Field(..., description="Prediction result")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "input": "Sample input data for the model",
                 "result": "1234"
             }
         }
+    )
 
 
 class AsyncPredictionResponse(BaseModel):
@@ -46,13 +51,14 @@ class AsyncPredictionResponse(BaseModel):
     message: str = Field(..., description="Status message")
     prediction_id: str = Field(..., description="Unique prediction identifier")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "message": "Request received. Processing asynchronously.",
                 "prediction_id": "abc123"
             }
         }
+    )
 
 
 class PredictionResult(BaseModel):
@@ -61,14 +67,15 @@ class PredictionResult(BaseModel):
     output: Dict[str, str] = Field(..., description="Prediction output")
     status: PredictionStatus = Field(..., description="Processing status")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "prediction_id": "abc123",
                 "output": {"input": "Sample input data", "result": "5678"},
                 "status": "completed"
             }
         }
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -76,10 +83,11 @@ class ErrorResponse(BaseModel):
     error: str = Field(..., description="Error description")
     detail: Optional[str] = Field(None, description="Additional error details")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "error": "Prediction ID not found.",
                 "detail": "The specified prediction ID does not exist in the system."
             }
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
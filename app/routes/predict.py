@@ -5,8 +5,10 @@ Prediction API endpoints with comprehensive error handling and validation.
 import uuid
 import asyncio
 import logging
-from fastapi import APIRouter, Header, HTTPException, BackgroundTasks
-from typing import Optional, Union
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from typing import Optional
 
 from app.models import (
     PredictionRequest, 
@@ -30,7 +32,7 @@ queue_service = get_queue_service()
 
 @router.post(
     "",
-    response_model=Union[SyncPredictionResponse, AsyncPredictionResponse],
+    response_model=None,
     responses={
         200: {"model": SyncPredictionResponse, "description": "Synchronous prediction completed"},
         202: {"model": AsyncPredictionResponse, "description": "Asynchronous prediction accepted"},
@@ -42,73 +44,128 @@ queue_service = get_queue_service()
 )
 async def predict(
     request: PredictionRequest,
-    background_tasks: BackgroundTasks,
     async_mode: Optional[str] = Header(None, alias="Async-Mode")
-) -> Union[SyncPredictionResponse, AsyncPredictionResponse]:
+) -> ORJSONResponse:
     """
     Main prediction endpoint supporting both sync and async modes.
     
+    Dispatches to the sync or async handler based on the Async-Mode header and
+    serializes its response directly, avoiding Union response validation.
+    
     - **Synchronous mode**: Processes immediately and returns result
-    - **Asynchronous mode**: Returns prediction ID and processes in background
+    - **Asynchronous mode**: Returns prediction ID; the queue consumer processes it
     
     Args:
         request: Prediction input data
-        background_tasks: FastAPI background task manager
         async_mode: Header to enable asynchronous processing
         
     Returns:
         Either immediate prediction result or async acceptance response
         
+    Raises:
+        HTTPException: For various error conditions
+    """
+    # Check if async mode is requested
+    is_async = async_mode is not None and async_mode.lower() == "true"
+    
+    if is_async:
+        response = await predict_async(request)
+        return ORJSONResponse(content=response.model_dump(), status_code=202)
+    
+    response = await predict_sync(request)
+    return ORJSONResponse(content=response.model_dump())
+
+
+@router.post(
+    "/sync",
+    response_model=SyncPredictionResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request"},
+        500: {"model": ErrorResponse, "description": "Internal server error"}
+    },
+    summary="Run Synchronous Prediction",
+    description="Execute prediction and wait for the result"
+)
+async def predict_sync(request: PredictionRequest) -> SyncPredictionResponse:
+    """
+    Synchronous prediction endpoint.
+    
+    Args:
+        request: Prediction input data
+        
+    Returns:
+        Immediate prediction result
+        
+    Raises:
+        HTTPException: For various error conditions
+    """
+    try:
+        logger.info("Processing sync prediction for input: %.50s...", request.input)
+        
+        # Run the blocking model call in the threadpool to keep the event loop free
+        result = await run_in_threadpool(prediction_service.mock_model_predict, request.input)
+        
+        return SyncPredictionResponse(
+            input=result["input"],
+            result=result["result"]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error in predict endpoint: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error occurred"
+        )
+
+
+@router.post(
+    "/async",
+    response_model=AsyncPredictionResponse,
+    status_code=202,
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request"},
+        500: {"model": ErrorResponse, "description": "Internal server error"}
+    },
+    summary="Submit Asynchronous Prediction",
+    description="Enqueue prediction and return an ID to retrieve the result later"
+)
+async def predict_async(request: PredictionRequest) -> AsyncPredictionResponse:
+    """
+    Asynchronous prediction endpoint.
+    
+    Args:
+        request: Prediction input data
+        
+    Returns:
+        Async acceptance response with the prediction ID
+        
     Raises:
         HTTPException: For various error conditions
     """
     try:
-        # Validate input length and content
-        if len(request.input.strip()) == 0:
+        prediction_id = uuid.uuid4().hex
+        
+        # Enqueue the prediction task for the queue consumer
+        success = await queue_service.enqueue_prediction(prediction_id, request.input)
+        if not success:
             raise HTTPException(
-                status_code=400,
-                detail="Input cannot be empty"
+                status_code=500,
+                detail="Failed to enqueue prediction task"
             )
         
-        # Check if async mode is requested
-        is_async = async_mode is not None and async_mode.lower() == "true"
-        
-        if is_async:
-            # Asynchronous processing
-            prediction_id = str(uuid.uuid4())
-            
-            # Enqueue the prediction task
-            success = queue_service.enqueue_prediction(prediction_id, request.input)
-            if not success:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to enqueue prediction task"
-                )
-            
-            # Start background processing
-            background_tasks.add_task(process_async_prediction, prediction_id, request.input)
-            
-            logger.info(f"Accepted async prediction request: {prediction_id}")
-            
-            return AsyncPredictionResponse(
-                message="Request received. Processing asynchronously.",
-                prediction_id=prediction_id
-            )
-        else:
-            # Synchronous processing
-            logger.info(f"Processing sync prediction for input: {request.input[:50]}...")
-            
-            result = prediction_service.mock_model_predict(request.input)
-            
-            return SyncPredictionResponse(
-                input=result["input"],
-                result=result["result"]
-            )
-            
+        logger.info("Accepted async prediction request: %s", prediction_id)
+        
+        return AsyncPredictionResponse(
+            message="Request received. Processing asynchronously.",
+            prediction_id=prediction_id
+        )
+        
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in predict endpoint: {e}")
+        logger.error("Unexpected error in predict endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Internal server error occurred"
@@ -148,8 +205,8 @@ async def get_prediction_result(prediction_id: str) -> PredictionResult:
                 detail="Invalid prediction ID format"
             )
         
-        # Check prediction status
-        status = queue_service.get_prediction_status(prediction_id)
+        # Fetch status and result together in one Redis round-trip
+        status, result = await queue_service.get_status_and_result(prediction_id)
         if status is None:
             raise HTTPException(
                 status_code=404,
@@ -170,8 +227,7 @@ async def get_prediction_result(prediction_id: str) -> PredictionResult:
                 detail="Prediction processing failed."
             )
         
-        # Get completed result
-        result = queue_service.get_prediction_result(prediction_id)
+        # Check completed result
         if result is None:
             # This shouldn't happen if status is completed, but handle gracefully
             raise HTTPException(
@@ -179,7 +235,7 @@ async def get_prediction_result(prediction_id: str) -> PredictionResult:
                 detail="Prediction result not available."
             )
         
-        logger.info(f"Retrieved result for prediction: {prediction_id}")
+        logger.info("Retrieved result for prediction: %s", prediction_id)
         
         return PredictionResult(
             prediction_id=prediction_id,
@@ -190,38 +246,8 @@ async def get_prediction_result(prediction_id: str) -> PredictionResult:
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error retrieving prediction {prediction_id}: {e}")
+        logger.error("Unexpected error retrieving prediction %s: %s", prediction_id, e)
         raise HTTPException(
             status_code=500,
             detail="Internal server error occurred"
-        )
-
-
-async def process_async_prediction(prediction_id: str, input_data: str) -> None:
-    """
-    Background task for processing asynchronous predictions.
-    
-    Args:
-        prediction_id: Unique prediction identifier
-        input_data: Input data for prediction
-    """
-    try:
-        logger.info(f"Starting async processing for prediction: {prediction_id}")
-        
-        # Update status to processing
-        queue_service.set_prediction_status(prediction_id, PredictionStatus.PROCESSING)
-        
-        # Process the prediction
-        result = await prediction_service.async_model_predict(input_data)
-        
-        # Store the result
-        success = queue_service.store_prediction_result(prediction_id, result)
-        if not success:
-            logger.error(f"Failed to store result for prediction: {prediction_id}")
-            queue_service.set_prediction_status(prediction_id, PredictionStatus.FAILED)
-        else:
-            logger.info(f"Completed async processing for prediction: {prediction_id}")
-            
-    except Exception as e:
-        logger.error(f"Error processing async prediction {prediction_id}: {e}")
-        queue_service.set_prediction_status(prediction_id, PredictionStatus.FAILED)
\ No newline at end of file
+        )
\ No newline at end of file
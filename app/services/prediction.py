@@ -6,11 +6,23 @@ import time
 import random
 import asyncio
 import logging
+import threading
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Per-thread RNG so threadpool predictions don't contend on the global random instance
+_thread_local = threading.local()
+
+
+def _rng() -> random.Random:
+    """Return the random generator owned by the current thread."""
+    rng = getattr(_thread_local, "rng", None)
+    if rng is None:
+        rng = _thread_local.rng = random.Random()
+    return rng
+
 
 class MockPredictionService:
     """
@@ -30,6 +42,7 @@ class MockPredictionService:
         self.max_delay = max_delay
         self.prediction_count = 0
         self.total_processing_time = 0.0
+        self._metrics_lock = threading.Lock()
     
     def mock_model_predict(self, input_data: str) -> Dict[str, str]:
         """
@@ -41,21 +54,20 @@ class MockPredictionService:
         Returns:
             Dictionary containing input and result
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Simulate processing delay as per requirements
-        delay = random.randint(self.min_delay, self.max_delay)
+        delay = _rng().randint(self.min_delay, self.max_delay)
         time.sleep(delay)
         
         # Generate random result
-        result = str(random.randint(1000, 20000))
+        result = str(_rng().randint(1000, 20000))
         
         # Track metrics
-        processing_time = time.time() - start_time
-        self.prediction_count += 1
-        self.total_processing_time += processing_time
+        processing_time = time.perf_counter() - start_time
+        self._record_metrics(processing_time)
         
-        logger.info(f"Prediction completed in {processing_time:.2f}s, result: {result}")
+        logger.info("Prediction completed in %.2fs, result: %s", processing_time, result)
         
         return {"input": input_data, "result": result}
     
@@ -69,29 +81,39 @@ class MockPredictionService:
         Returns:
             Dictionary containing input and result
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Simulate async processing delay
-        delay = random.randint(self.min_delay, self.max_delay)
+        delay = _rng().randint(self.min_delay, self.max_delay)
         await asyncio.sleep(delay)
         
         # Simulate occasional processing failures (5% chance)
-        if random.random() < 0.05:
-            logger.warning(f"Prediction failed for input: {input_data[:50]}")
+        if _rng().random() < 0.05:
+            logger.warning("Prediction failed for input: %.50s", input_data)
             raise Exception("Model prediction failed due to internal error")
         
         # Generate random result
-        result = str(random.randint(1000, 20000))
+        result = str(_rng().randint(1000, 20000))
         
         # Track metrics
-        processing_time = time.time() - start_time
-        self.prediction_count += 1
-        self.total_processing_time += processing_time
+        processing_time = time.perf_counter() - start_time
+        self._record_metrics(processing_time)
         
-        logger.info(f"Async prediction completed in {processing_time:.2f}s, result: {result}")
+        logger.info("Async prediction completed in %.2fs, result: %s", processing_time, result)
         
         return {"input": input_data, "result": result}
     
+    def _record_metrics(self, processing_time: float) -> None:
+        """
+        Update prediction counters safely under concurrent predictions.
+        
+        Args:
+            processing_time: Time spent on the prediction in seconds
+        """
+        with self._metrics_lock:
+            self.prediction_count += 1
+            self.total_processing_time += processing_time
+    
     def get_performance_metrics(self) -> Dict[str, float]:
         """
         Get performance statistics for monitoring.
@@ -99,11 +121,14 @@ class MockPredictionService:
         Returns:
             Dictionary with performance metrics
         """
-        avg_time = self.total_processing_time / max(1, self.prediction_count)
+        # Read both counters under the lock so the average matches the count
+        with self._metrics_lock:
+            count = self.prediction_count
+            total_time = self.total_processing_time
         return {
-            "total_predictions": self.prediction_count,
-            "average_processing_time": avg_time,
-            "total_processing_time": self.total_processing_time
+            "total_predictions": count,
+            "average_processing_time": total_time / max(1, count),
+            "total_processing_time": total_time
         }
 
 
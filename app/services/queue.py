@@ -1,171 +1,388 @@
 # app/services/queue.py
 
+import asyncio
 import redis
-import json
+import redis.asyncio as aioredis
+import msgspec
+import cachetools
 import logging
 import os
-from typing import Dict, Optional, Any
-from datetime import datetime
+import time
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from collections import deque
 import uuid
 
 from app.models import PredictionStatus
 
 logger = logging.getLogger(__name__)
 
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+
+# Backoff between failed stream reads (seconds), doubled per consecutive failure
+READ_BACKOFF_MIN = 0.1
+READ_BACKOFF_MAX = 5.0
+
+# Decode responses per workload pool. Results and stream tasks are MessagePack bytes,
+# and blocking XREADGROUP calls get their own pool so long BLOCK reads never hold
+# connections that status/result lookups are waiting on. Pools are left uncapped:
+# redis.asyncio.ConnectionPool fails fast with "Too many connections" at its cap
+# instead of waiting, which would surface as errors under load.
+_POOL_DECODE_RESPONSES = {
+    "default": True,
+    "results": False,
+    "stream": False,
+}
+
+# Per-process connection pools, created lazily and shared by all service instances
+_pools: Dict[Tuple[str, str], aioredis.ConnectionPool] = {}
+
+
+def _get_pool(workload: str, redis_url: str) -> aioredis.ConnectionPool:
+    """Return the shared pool for a workload, creating it on first use"""
+    key = (workload, redis_url)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = aioredis.ConnectionPool.from_url(
+            redis_url, decode_responses=_POOL_DECODE_RESPONSES[workload]
+        )
+    return pool
+
+
+# Writes the result and its COMPLETED status atomically in one round-trip
+_STORE_RESULT_LUA = """
+redis.call('SETEX', KEYS[1], ARGV[1], ARGV[2])
+redis.call('SETEX', KEYS[2], ARGV[1], ARGV[3])
+return 1
+"""
+
+
+class Task(msgspec.Struct, gc=False, omit_defaults=True):
+    """Prediction task carried in the stream as a single MessagePack field."""
+    prediction_id: str
+    input_data: str
+    created_at: int  # Epoch nanoseconds from time.time_ns()
+    message_id: str = ""  # Assigned by Redis; not part of the encoded payload
+
 
 class RedisQueueService:
+    # Status lookup for both str (default pool) and bytes (results pool) replies
+    _STATUS_MAP = {
+        **{s.value: s for s in PredictionStatus},
+        **{s.value.encode(): s for s in PredictionStatus},
+    }
+
     def __init__(self, redis_url: str = None):
         # Get Redis URL from environment variable or use default
         if redis_url is None:
-            redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
-        
-        logger.info(f"Connecting to Redis at: {redis_url}")
-        
-        try:
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            # Test the connection
-            self.redis_client.ping()
-            logger.info("Redis connection established successfully")
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            raise
-            
+            redis_url = REDIS_URL
+
+        logger.info("Using Redis connection pools for: %s", redis_url)
+        self.redis_client = aioredis.Redis(connection_pool=_get_pool("default", redis_url))
+        self.result_client = aioredis.Redis(connection_pool=_get_pool("results", redis_url))
+        self.stream_client = aioredis.Redis(connection_pool=_get_pool("stream", redis_url))
+        # Runs via EVALSHA and reloads itself on NOSCRIPT; nothing is sent to Redis here
+        self._store_script = self.result_client.register_script(_STORE_RESULT_LUA)
+
         self.stream_name = "prediction_tasks"
         self.consumer_group = "prediction_workers"
         self.consumer_name = f"worker_{uuid.uuid4().hex[:8]}"
         self.results_prefix = "prediction_result:"
         self.status_prefix = "prediction_status:"
         self.result_ttl = 86400  # 24 hours
+        self._result_prefix_b = self.results_prefix.encode()
+        self._status_prefix_b = self.status_prefix.encode()
+        self._group_ready = False  # Set once the consumer group is known to exist
+        self._task_buffer: Deque[Task] = deque()
+        self._reclaim_cursor = b"0-0"
+        self._prefetch = 32
+        self._read_backoff = READ_BACKOFF_MIN
+        self._ack_buffer: List[str] = []
+        # Message IDs delivered to this consumer and not yet acknowledged
+        self._claimed_ids: Set[str] = set()
+        self._ack_batch = 32
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder(Dict[str, str])
+        # Results written before the MessagePack switch are JSON until their TTL runs out
+        self._legacy_decoder = msgspec.json.Decoder(Dict[str, str])
+        self._task_decoder = msgspec.msgpack.Decoder(Task)
+        # Local caches for terminal states, which don't change until the keys expire
+        self._result_cache = cachetools.TTLCache(maxsize=10_000, ttl=5.0)
+        self._status_cache = cachetools.TTLCache(maxsize=10_000, ttl=0.2)
+
+    def _rkey(self, prediction_id: str) -> bytes:
+        """Build the result key for a prediction"""
+        return self._result_prefix_b + prediction_id.encode()
+
+    def _skey(self, prediction_id: str) -> bytes:
+        """Build the status key for a prediction"""
+        return self._status_prefix_b + prediction_id.encode()
+
+    async def connect(self) -> None:
+        """Verify the Redis connection; raises if Redis is unreachable"""
+        await self.redis_client.ping()
+        logger.info("Redis connection established successfully")
 
-    def setup_consumer_group(self):
+    async def setup_consumer_group(self):
         try:
-            self.redis_client.xgroup_create(
+            await self.redis_client.xgroup_create(
                 self.stream_name,
                 self.consumer_group,
                 id='0',
                 mkstream=True
             )
-            logger.info(f"Created consumer group: {self.consumer_group}")
+            logger.info("Created consumer group: %s", self.consumer_group)
+            self._group_ready = True
         except redis.exceptions.ResponseError as e:
             if "BUSYGROUP" in str(e):
-                logger.info(f"Consumer group already exists: {self.consumer_group}")
+                logger.info("Consumer group already exists: %s", self.consumer_group)
+                self._group_ready = True
             else:
-                logger.error(f"Failed to create consumer group: {e}")
+                logger.error("Failed to create consumer group: %s", e)
                 raise
 
-    def enqueue_prediction(self, prediction_id: str, input_data: str) -> bool:
+    async def enqueue_prediction(self, prediction_id: str, input_data: str) -> bool:
         try:
-            self.set_prediction_status(prediction_id, PredictionStatus.PENDING)
-            task_data = {
-                "prediction_id": prediction_id,
-                "input_data": input_data,
-                "created_at": datetime.utcnow().isoformat()
-            }
-            stream_id = self.redis_client.xadd(self.stream_name, task_data)
-            logger.info(f"Enqueued prediction {prediction_id} with stream ID: {stream_id}")
-            return True
+            if not self._group_ready:
+                await self.setup_consumer_group()
+            task = Task(
+                prediction_id=prediction_id,
+                input_data=input_data,
+                created_at=time.time_ns()
+            )
+            # Set the pending status and enqueue the task in a single round-trip
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(
+                    self._skey(prediction_id),
+                    self.result_ttl,
+                    PredictionStatus.PENDING.value
+                )
+                pipe.xadd(self.stream_name, {b"m": self._encoder.encode(task)})
+                _, stream_id = await pipe.execute()
+            logger.info("Enqueued prediction %s with stream ID: %s", prediction_id, stream_id)
+            return bool(stream_id)
         except Exception as e:
-            logger.error(f"Failed to enqueue prediction {prediction_id}: {e}")
+            logger.error("Failed to enqueue prediction %s: %s", prediction_id, e)
             return False
 
-    def get_next_task(self, timeout: int = 1000) -> Optional[Dict[str, Any]]:
-        try:
-            messages = self.redis_client.xreadgroup(
-                self.consumer_group,
-                self.consumer_name,
-                {self.stream_name: '>'},
-                count=1,
-                block=timeout
-            )
-            if messages:
-                stream, msgs = messages[0]
-                if msgs:
-                    msg_id, fields = msgs[0]
-                    return {
-                        "message_id": msg_id,
-                        "prediction_id": fields["prediction_id"],
-                        "input_data": fields["input_data"],
-                        "created_at": fields["created_at"]
-                    }
-            return None
-        except Exception as e:
-            logger.error(f"Failed to get next task: {e}")
-            return None
+    async def get_next_tasks(self, max_count: int = 32, timeout: int = 1000) -> List[Task]:
+        """Return up to max_count tasks, refilling the local buffer with one XREADGROUP"""
+        if not self._task_buffer:
+            try:
+                if not self._group_ready:
+                    await self.setup_consumer_group()
+                messages = await self.stream_client.xreadgroup(
+                    self.consumer_group,
+                    self.consumer_name,
+                    {self.stream_name: '>'},
+                    # Only take what the caller can run now; the rest stays for other consumers
+                    count=min(self._prefetch, max_count),
+                    block=timeout
+                )
+                self._read_backoff = READ_BACKOFF_MIN
+                if messages:
+                    stream, msgs = messages[0]
+                    self._buffer_entries(msgs)
+            except Exception as e:
+                logger.error("Failed to get next tasks (retrying in %.1fs): %s", self._read_backoff, e)
+                self._reset_group_if_missing(e)
+                # Back off so a polling loop doesn't spin against a failing Redis
+                await asyncio.sleep(self._read_backoff)
+                self._read_backoff = min(self._read_backoff * 2, READ_BACKOFF_MAX)
+                return []
+
+        count = min(max_count, len(self._task_buffer))
+        return [self._task_buffer.popleft() for _ in range(count)]
+
+    def _reset_group_if_missing(self, error: Exception) -> None:
+        """Recreate the consumer group on next use if Redis lost the stream or group"""
+        if isinstance(error, redis.exceptions.ResponseError) and "NOGROUP" in str(error):
+            self._group_ready = False
 
-    def acknowledge_task(self, message_id: str) -> bool:
+    def _buffer_entries(self, entries: List[Tuple[bytes, Dict[bytes, bytes]]]) -> int:
+        """Decode stream entries into the task buffer; undecodable entries are acked and dropped"""
+        buffered = 0
+        for msg_id, fields in entries:
+            try:
+                task = self._task_decoder.decode(fields[b"m"])
+            except (KeyError, TypeError, msgspec.DecodeError) as e:
+                logger.error("Dropping malformed stream entry %s: %r", msg_id, e)
+                # Ack through the batched path so the entry doesn't stay in the PEL
+                self._ack_buffer.append(msg_id.decode())
+                continue
+            task.message_id = msg_id.decode()
+            self._claimed_ids.add(task.message_id)
+            self._task_buffer.append(task)
+            buffered += 1
+        return buffered
+
+    async def get_next_task(self, timeout: int = 1000) -> Optional[Task]:
+        tasks = await self.get_next_tasks(max_count=1, timeout=timeout)
+        return tasks[0] if tasks else None
+
+    async def acknowledge_task(self, message_id: str) -> bool:
+        """Buffer an acknowledgement; XACK is sent once a full batch is pending"""
+        self._ack_buffer.append(message_id)
+        if len(self._ack_buffer) >= self._ack_batch:
+            return await self.flush_acks()
+        return True
+
+    async def flush_acks(self) -> bool:
+        """Acknowledge all buffered message IDs with a single XACK"""
+        if not self._ack_buffer:
+            return True
+        message_ids, self._ack_buffer = self._ack_buffer, []
         try:
-            self.redis_client.xack(self.stream_name, self.consumer_group, message_id)
+            await self.redis_client.xack(self.stream_name, self.consumer_group, *message_ids)
+            self._claimed_ids.difference_update(message_ids)
             return True
         except Exception as e:
-            logger.error(f"Failed to acknowledge task {message_id}: {e}")
+            logger.error("Failed to acknowledge %d tasks: %s", len(message_ids), e)
+            # Keep the IDs so the next flush retries them
+            self._ack_buffer.extend(message_ids)
             return False
 
-    def store_prediction_result(self, prediction_id: str, result: Dict[str, str]) -> bool:
+    async def store_prediction_result(self, prediction_id: str, result: Dict[str, str]) -> bool:
         try:
-            result_key = f"{self.results_prefix}{prediction_id}"
-            result_json = json.dumps(result)
-            self.redis_client.setex(result_key, self.result_ttl, result_json)
-            self.set_prediction_status(prediction_id, PredictionStatus.COMPLETED)
-            logger.info(f"Stored result for prediction {prediction_id}")
+            result_key = self._rkey(prediction_id)
+            status_key = self._skey(prediction_id)
+            payload = self._encoder.encode(result)
+            await self._store_script(
+                keys=[result_key, status_key],
+                args=[self.result_ttl, payload, PredictionStatus.COMPLETED.value]
+            )
+            self._invalidate_cache(prediction_id)
+            logger.info("Stored result for prediction %s", prediction_id)
             return True
         except Exception as e:
-            logger.error(f"Failed to store result for {prediction_id}: {e}")
+            logger.error("Failed to store result for %s: %s", prediction_id, e)
             return False
 
-    def get_prediction_result(self, prediction_id: str) -> Optional[Dict[str, str]]:
+    async def get_prediction_result(self, prediction_id: str) -> Optional[Dict[str, str]]:
+        cached = self._result_cache.get(prediction_id)
+        if cached is not None:
+            return cached
         try:
-            result_key = f"{self.results_prefix}{prediction_id}"
-            result_json = self.redis_client.get(result_key)
-            if result_json:
-                return json.loads(result_json)
+            result_key = self._rkey(prediction_id)
+            payload = await self.result_client.get(result_key)
+            if payload:
+                result = self._result_cache[prediction_id] = self._decode_result(payload)
+                return result
             return None
         except Exception as e:
-            logger.error(f"Failed to get result for {prediction_id}: {e}")
+            logger.error("Failed to get result for %s: %s", prediction_id, e)
             return None
 
-    def set_prediction_status(self, prediction_id: str, status: PredictionStatus) -> bool:
+    async def set_prediction_status(self, prediction_id: str, status: PredictionStatus) -> bool:
         try:
-            status_key = f"{self.status_prefix}{prediction_id}"
-            self.redis_client.setex(status_key, self.result_ttl, status.value)
+            status_key = self._skey(prediction_id)
+            await self.redis_client.setex(status_key, self.result_ttl, status.value)
+            self._status_cache.pop(prediction_id, None)
             return True
         except Exception as e:
-            logger.error(f"Failed to set status for {prediction_id}: {e}")
+            logger.error("Failed to set status for %s: %s", prediction_id, e)
             return False
 
-    def get_prediction_status(self, prediction_id: str) -> Optional[PredictionStatus]:
+    async def get_prediction_status(self, prediction_id: str) -> Optional[PredictionStatus]:
+        cached = self._status_cache.get(prediction_id)
+        if cached is not None:
+            return cached
         try:
-            status_key = f"{self.status_prefix}{prediction_id}"
-            status_value = self.redis_client.get(status_key)
+            status_key = self._skey(prediction_id)
+            status_value = await self.redis_client.get(status_key)
             if status_value:
-                return PredictionStatus(status_value)
+                status = self._STATUS_MAP.get(status_value)
+                self._cache_terminal(prediction_id, status)
+                return status
             return None
         except Exception as e:
-            logger.error(f"Failed to get status for {prediction_id}: {e}")
+            logger.error("Failed to get status for %s: %s", prediction_id, e)
             return None
 
-    def cleanup_expired_data(self) -> int:
+    async def get_status_and_result(
+        self, prediction_id: str
+    ) -> Tuple[Optional[PredictionStatus], Optional[Dict[str, str]]]:
+        """Fetch status and result in a single pipelined round-trip"""
+        # A cached result implies the prediction completed
+        cached = self._result_cache.get(prediction_id)
+        if cached is not None:
+            return PredictionStatus.COMPLETED, cached
+        if self._status_cache.get(prediction_id) == PredictionStatus.FAILED:
+            return PredictionStatus.FAILED, None
         try:
-            pattern = f"{self.status_prefix}*"
-            keys = self.redis_client.keys(pattern)
-            cleaned = 0
-            for key in keys:
-                ttl = self.redis_client.ttl(key)
-                if ttl == -1:
-                    self.redis_client.expire(key, self.result_ttl)
-                    cleaned += 1
-            logger.info(f"Cleaned up {cleaned} entries")
-            return cleaned
+            async with self.result_client.pipeline(transaction=False) as pipe:
+                pipe.get(self._skey(prediction_id))
+                pipe.get(self._rkey(prediction_id))
+                status_value, payload = await pipe.execute()
+            status = self._STATUS_MAP.get(status_value)
+            result = self._decode_result(payload) if payload else None
+            self._cache_terminal(prediction_id, status, result)
+            return status, result
+        except Exception as e:
+            logger.error("Failed to get status and result for %s: %s", prediction_id, e)
+            return None, None
+
+    def _decode_result(self, payload: bytes) -> Dict[str, str]:
+        """Decode a stored result, falling back to the legacy JSON encoding"""
+        try:
+            return self._decoder.decode(payload)
+        except msgspec.DecodeError:
+            return self._legacy_decoder.decode(payload)
+
+    def _cache_terminal(
+        self,
+        prediction_id: str,
+        status: Optional[PredictionStatus],
+        result: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Cache completed/failed states; pending and processing are never cached"""
+        if status in (PredictionStatus.COMPLETED, PredictionStatus.FAILED):
+            self._status_cache[prediction_id] = status
+            if status == PredictionStatus.COMPLETED and result is not None:
+                self._result_cache[prediction_id] = result
+
+    def _invalidate_cache(self, prediction_id: str) -> None:
+        """Drop any locally cached state for a prediction"""
+        self._status_cache.pop(prediction_id, None)
+        self._result_cache.pop(prediction_id, None)
+
+    async def reclaim_stale(self, min_idle_ms: int = 60_000, count: int = 100) -> int:
+        """Claim tasks left pending by dead consumers into the local buffer with XAUTOCLAIM"""
+        # Only top up an idle buffer; tasks still buffered here would otherwise be claimed again
+        if self._task_buffer or count <= 0:
+            return 0
+        try:
+            if not self._group_ready:
+                await self.setup_consumer_group()
+            reply = await self.stream_client.xautoclaim(
+                self.stream_name,
+                self.consumer_group,
+                self.consumer_name,
+                min_idle_time=min_idle_ms,
+                start_id=self._reclaim_cursor,
+                count=count
+            )
+            self._reclaim_cursor = reply[0]
+            # Skip entries deleted from the stream (Redis < 7) and ones this consumer still holds
+            entries = [
+                (msg_id, fields) for msg_id, fields in reply[1]
+                if msg_id is not None and msg_id.decode() not in self._claimed_ids
+            ]
+            reclaimed = self._buffer_entries(entries)
+            if reclaimed:
+                logger.info("Reclaimed %d stale tasks", reclaimed)
+            return reclaimed
         except Exception as e:
-            logger.error(f"Failed to cleanup expired data: {e}")
+            logger.error("Failed to reclaim stale tasks: %s", e)
+            self._reset_group_if_missing(e)
             return 0
 
-    def health_check(self) -> bool:
+    async def health_check(self) -> bool:
         """Check if Redis connection is healthy"""
         try:
-            self.redis_client.ping()
+            await self.redis_client.ping()
             return True
         except Exception as e:
-            logger.error(f"Redis health check failed: {e}")
+            logger.error("Redis health check failed: %s", e)
             return False
 
 
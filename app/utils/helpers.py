@@ -3,82 +3,97 @@ Utility functions for common operations and configurations.
 """
 
 import os
+import queue
 import logging
-import json
-from typing import Dict, Any
+import logging.handlers
+import time
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, Mapping
 from datetime import datetime
 
 
-def setup_logging(log_level: str = "INFO") -> None:
+class RestartableQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose start() and stop() are idempotent and can be repeated."""
+
+    def start(self) -> None:
+        if self._thread is None:
+            super().start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(log_level: str = "INFO") -> RestartableQueueListener:
     """
     Configure structured logging for the application.
+    Records are queued by the root logger and written by a listener thread,
+    which is started here so records are emitted even if no lifespan runs.
     
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR)
+        
+    Returns:
+        Running listener owning the real handlers (safe to stop and restart)
     """
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler()]
+    if os.getenv('LOG_TO_FILE'):
+        handlers.append(logging.FileHandler('app.log'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Unbounded: a full queue would make QueueHandler report errors on the caller
+    log_queue = queue.Queue(-1)
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('app.log') if os.getenv('LOG_TO_FILE') else logging.NullHandler()
-        ]
+        format='%(message)s',
+        handlers=[logging.handlers.QueueHandler(log_queue)]
     )
+    listener = RestartableQueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
 
 
-def get_config() -> Dict[str, Any]:
+@lru_cache(maxsize=1)
+def get_config() -> Mapping[str, Any]:
     """
     Get application configuration from environment variables.
+    Parsed once per process; use get_config.cache_clear() to reload.
     
     Returns:
-        Configuration dictionary
+        Read-only configuration mapping
     """
-    return {
+    return MappingProxyType({
         "redis_url": os.getenv("REDIS_URL", "redis://localhost:6379"),
         "log_level": os.getenv("LOG_LEVEL", "INFO"),
         "cors_origins": os.getenv("CORS_ORIGINS", "*").split(","),
+        "allowed_hosts": os.getenv("ALLOWED_HOSTS", "*").split(","),
         "prediction_timeout": int(os.getenv("PREDICTION_TIMEOUT", "30")),
         "max_input_length": int(os.getenv("MAX_INPUT_LENGTH", "10000")),
         "result_ttl": int(os.getenv("RESULT_TTL", "86400")),
-    }
+    })
 
 
-def format_response_time(start_time: datetime) -> str:
+def format_response_time(start_time: float) -> str:
     """
     Calculate and format response time.
     
     Args:
-        start_time: Request start time
+        start_time: Request start time from time.perf_counter()
         
     Returns:
         Formatted response time string
     """
-    duration = datetime.now() - start_time
-    return f"{duration.total_seconds():.3f}s"
+    return f"{time.perf_counter() - start_time:.3f}s"
 
 
 class HealthChecker:
     """Health check utilities for monitoring service status."""
     
     @staticmethod
-    def check_redis_connection(redis_client) -> bool:
-        """
-        Check Redis connectivity.
-        
-        Args:
-            redis_client: Redis client instance
-            
-        Returns:
-            True if connected, False otherwise
-        """
-        try:
-            redis_client.ping()
-            return True
-        except Exception:
-            return False
-    
-    @staticmethod
-    def get_system_health() -> Dict[str, Any]:
+    async def get_system_health() -> Dict[str, Any]:
         """
         Get overall system health status.
         
@@ -88,13 +103,11 @@ class HealthChecker:
         from app.services.queue import get_queue_service
         from app.services.prediction import prediction_service
 
-        queue_service = get_queue_service()
-
         return {
             "timestamp": datetime.utcnow().isoformat(),
             "status": "healthy",
             "services": {
-                "redis": HealthChecker.check_redis_connection(queue_service.redis_client),
+                "redis": await get_queue_service().health_check(),
                 "prediction_service": True,  # Always available for mock service
             },
             "metrics": prediction_service.get_performance_metrics()
@@ -0,0 +1,168 @@
+"""
+Redis Streams consumer that processes asynchronous predictions outside the web workers.
+
+Run as a separate process: python -m app.workers.consumer
+"""
+
+import asyncio
+import logging
+import os
+import signal
+from typing import Set
+
+from app.models import PredictionStatus
+from app.services.prediction import prediction_service
+from app.services.queue import RedisQueueService, Task, get_queue_service
+from app.utils.helpers import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of predictions processed concurrently by one consumer
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "16"))
+
+# Longest time a processed message waits in the ack buffer before XACK (seconds)
+ACK_FLUSH_INTERVAL = 0.05
+
+# How often idle pending tasks of dead consumers are reclaimed (seconds)
+RECLAIM_INTERVAL = 30.0
+
+# Upper bound on tasks claimed per reclaim pass
+RECLAIM_BATCH = 100
+
+
+async def process_async_prediction(
+    queue_service: RedisQueueService,
+    prediction_id: str,
+    input_data: str
+) -> None:
+    """
+    Process a single asynchronous prediction and store its result.
+    
+    Args:
+        queue_service: Queue service used for status and result storage
+        prediction_id: Unique prediction identifier
+        input_data: Input data for prediction
+    """
+    try:
+        logger.info("Starting async processing for prediction: %s", prediction_id)
+        
+        # Update status to processing
+        await queue_service.set_prediction_status(prediction_id, PredictionStatus.PROCESSING)
+        
+        # Process the prediction
+        result = await prediction_service.async_model_predict(input_data)
+        
+        # Store the result
+        success = await queue_service.store_prediction_result(prediction_id, result)
+        if not success:
+            logger.error("Failed to store result for prediction: %s", prediction_id)
+            await queue_service.set_prediction_status(prediction_id, PredictionStatus.FAILED)
+        else:
+            logger.info("Completed async processing for prediction: %s", prediction_id)
+            
+    except Exception as e:
+        logger.error("Error processing async prediction %s: %s", prediction_id, e)
+        await queue_service.set_prediction_status(prediction_id, PredictionStatus.FAILED)
+
+
+async def handle_task(queue_service: RedisQueueService, task: Task) -> None:
+    """
+    Process a stream task and acknowledge it in the consumer group.
+    
+    Args:
+        queue_service: Queue service the task was read from
+        task: Task returned by get_next_tasks
+    """
+    await process_async_prediction(queue_service, task.prediction_id, task.input_data)
+    await queue_service.acknowledge_task(task.message_id)
+
+
+async def flush_acks_periodically(
+    queue_service: RedisQueueService,
+    interval: float = ACK_FLUSH_INTERVAL
+) -> None:
+    """
+    Flush buffered acknowledgements on a fixed interval to bound ack latency.
+    
+    Args:
+        queue_service: Queue service holding the ack buffer
+        interval: Seconds between flushes
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await queue_service.flush_acks()
+
+
+async def run_worker(concurrency: int = WORKER_CONCURRENCY) -> None:
+    """
+    Read tasks from the prediction stream and process them until cancelled.
+    
+    Args:
+        concurrency: Maximum number of predictions in flight at once
+    """
+    queue_service = get_queue_service()
+    await queue_service.connect()
+    await queue_service.setup_consumer_group()
+    logger.info("Consumer %s started (concurrency=%d)", queue_service.consumer_name, concurrency)
+
+    in_flight: Set[asyncio.Task] = set()
+
+    ack_flusher = asyncio.create_task(flush_acks_periodically(queue_service))
+
+    loop = asyncio.get_running_loop()
+    next_reclaim = loop.time() + RECLAIM_INTERVAL
+
+    # docker stop sends SIGTERM; cancel the loop so shutdown drains work and flushes acks
+    try:
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass  # Signal handlers are unavailable on Windows event loops
+
+    try:
+        while True:
+            free_slots = concurrency - len(in_flight)
+            if free_slots <= 0:
+                # Don't read ahead: tasks held locally keep aging in the PEL
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight.difference_update(done)
+                continue
+            if loop.time() >= next_reclaim:
+                next_reclaim = loop.time() + RECLAIM_INTERVAL
+                await queue_service.reclaim_stale(count=min(RECLAIM_BATCH, free_slots))
+            # Read at most as many tasks as there are free slots
+            for stream_task in await queue_service.get_next_tasks(max_count=free_slots):
+                task = asyncio.create_task(handle_task(queue_service, stream_task))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+    finally:
+        # A second SIGTERM during the drain falls back to the default hard stop
+        try:
+            loop.remove_signal_handler(signal.SIGTERM)
+        except NotImplementedError:
+            pass
+        if in_flight:
+            logger.info("Waiting for %d in-flight predictions", len(in_flight))
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        ack_flusher.cancel()
+        await queue_service.flush_acks()
+
+
+def main() -> None:
+    """Entry point for the standalone consumer process."""
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    log_listener = setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    try:
+        asyncio.run(run_worker())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info("Consumer stopped")
+    finally:
+        log_listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Shared test fixtures.
+"""
+
+import asyncio
+import itertools
+from collections import deque
+
+import pytest
+import redis.asyncio as aioredis
+
+import app.services.queue as queue_module
+from app.services.queue import RedisQueueService
+
+
+class StubRedisConnection(aioredis.Connection):
+    """Redis connection answering a few commands from memory after a short delay."""
+
+    latency = 0.01
+    store: dict = {}
+    _stream_ids = itertools.count(1)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sent = deque()
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self, nowait: bool = False):
+        pass
+
+    async def can_read_destructive(self):
+        return False
+
+    def pack_command(self, *args):
+        return [args]
+
+    def pack_commands(self, commands):
+        return [tuple(args) for args in commands]
+
+    async def send_packed_command(self, command, check_health: bool = True):
+        self._sent.extend(command)
+
+    async def read_response(self, disable_decoding: bool = False, **kwargs):
+        # Hold the connection like a real round-trip would
+        await asyncio.sleep(self.latency)
+        name, *args = self._sent.popleft()
+        name = name.upper()
+        if name == "PING":
+            response = b"PONG"
+        elif name == "SETEX":
+            self.store[self.encoder.encode(args[0])] = self.encoder.encode(args[2])
+            response = b"OK"
+        elif name == "GET":
+            response = self.store.get(self.encoder.encode(args[0]))
+        elif name == "XADD":
+            response = b"%d-0" % next(self._stream_ids)
+        else:
+            raise NotImplementedError(name)
+        return response if disable_decoding else self.encoder.decode(response)
+
+
+@pytest.fixture
+def stub_queue_service(monkeypatch):
+    """Queue service using the real shared pools, backed by stub connections."""
+    monkeypatch.setattr(queue_module, "_pools", {})
+    monkeypatch.setattr(StubRedisConnection, "store", {})
+    service = RedisQueueService("redis://stub:6379")
+    for client in (service.redis_client, service.result_client, service.stream_client):
+        client.connection_pool.connection_class = StubRedisConnection
+    service._group_ready = True
+    return service
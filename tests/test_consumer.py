@@ -0,0 +1,135 @@
+"""
+Test suite for the Redis Streams consumer worker.
+"""
+
+import pytest
+import asyncio
+import os
+import signal
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.models import PredictionStatus
+from app.services.queue import Task
+from app.workers import consumer
+
+
+@pytest.fixture
+def mock_queue_service():
+    """Mock queue service as seen by the worker."""
+    service = MagicMock()
+    service.consumer_name = "worker_test"
+    for name in ("connect", "setup_consumer_group", "flush_acks", "reclaim_stale",
+                 "acknowledge_task", "set_prediction_status", "store_prediction_result"):
+        setattr(service, name, AsyncMock())
+    service.store_prediction_result.return_value = True
+    return service
+
+
+class TestProcessAsyncPrediction:
+    """Test suite for processing a single stream task."""
+
+    @pytest.mark.asyncio
+    async def test_success_stores_result(self, mock_queue_service):
+        """Test a successful prediction is marked processing and its result stored."""
+        result = {"input": "x", "result": "1234"}
+        with patch.object(consumer.prediction_service, "async_model_predict",
+                          AsyncMock(return_value=result)):
+            await consumer.process_async_prediction(mock_queue_service, "p1", "x")
+
+        mock_queue_service.set_prediction_status.assert_awaited_once_with(
+            "p1", PredictionStatus.PROCESSING
+        )
+        mock_queue_service.store_prediction_result.assert_awaited_once_with("p1", result)
+
+    @pytest.mark.asyncio
+    async def test_failed_store_marks_failed(self, mock_queue_service):
+        """Test a result that cannot be stored marks the prediction failed."""
+        mock_queue_service.store_prediction_result.return_value = False
+        with patch.object(consumer.prediction_service, "async_model_predict",
+                          AsyncMock(return_value={"input": "x", "result": "1234"})):
+            await consumer.process_async_prediction(mock_queue_service, "p1", "x")
+
+        mock_queue_service.set_prediction_status.assert_awaited_with("p1", PredictionStatus.FAILED)
+
+    @pytest.mark.asyncio
+    async def test_model_error_marks_failed(self, mock_queue_service):
+        """Test a model exception marks the prediction failed without storing a result."""
+        with patch.object(consumer.prediction_service, "async_model_predict",
+                          AsyncMock(side_effect=Exception("model error"))):
+            await consumer.process_async_prediction(mock_queue_service, "p1", "x")
+
+        mock_queue_service.store_prediction_result.assert_not_awaited()
+        mock_queue_service.set_prediction_status.assert_awaited_with("p1", PredictionStatus.FAILED)
+
+    @pytest.mark.asyncio
+    async def test_handle_task_acknowledges(self, mock_queue_service):
+        """Test a handled task is acknowledged by its message ID, even when it fails."""
+        with patch.object(consumer.prediction_service, "async_model_predict",
+                          AsyncMock(side_effect=Exception("model error"))):
+            await consumer.handle_task(mock_queue_service, Task("p1", "x", 1, "7-0"))
+
+        mock_queue_service.acknowledge_task.assert_awaited_once_with("7-0")
+
+
+class TestRunWorker:
+    """Test suite for the worker read loop."""
+
+    @pytest.mark.asyncio
+    async def test_reads_only_free_slots(self, mock_queue_service):
+        """Test the worker never reads more tasks than it has free slots for."""
+        release = asyncio.Event()
+        batches = [[Task("p1", "x", 1, "1-0"), Task("p2", "x", 2, "2-0")]]
+
+        async def get_next_tasks(max_count):
+            await asyncio.sleep(0.01)  # Stands in for the XREADGROUP block
+            return batches.pop(0) if batches else []
+
+        async def handle_task(queue_service, task):
+            await release.wait()
+
+        mock_queue_service.get_next_tasks = AsyncMock(side_effect=get_next_tasks)
+        with patch.object(consumer, "get_queue_service", return_value=mock_queue_service), \
+                patch.object(consumer, "handle_task", side_effect=handle_task):
+            worker = asyncio.create_task(consumer.run_worker(concurrency=2))
+            await asyncio.sleep(0.1)
+
+            # Both slots are busy, so nothing else is read
+            assert mock_queue_service.get_next_tasks.await_count == 1
+
+            release.set()
+            await asyncio.sleep(0.1)
+            worker.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await worker
+
+        counts = [call.kwargs["max_count"] for call in mock_queue_service.get_next_tasks.await_args_list]
+        assert counts[0] == 2
+        assert all(count <= 2 for count in counts)
+        assert len(counts) > 1
+        mock_queue_service.flush_acks.assert_awaited()
+
+    @pytest.mark.asyncio
+    async def test_sigterm_drains_and_flushes(self, mock_queue_service):
+        """Test SIGTERM stops the loop, waits for in-flight work and flushes acks."""
+        finished = []
+        batches = [[Task("p1", "x", 1, "1-0")]]
+
+        async def get_next_tasks(max_count):
+            await asyncio.sleep(0.01)
+            return batches.pop(0) if batches else []
+
+        async def handle_task(queue_service, task):
+            await asyncio.sleep(0.1)
+            finished.append(task.prediction_id)
+
+        mock_queue_service.get_next_tasks = AsyncMock(side_effect=get_next_tasks)
+        with patch.object(consumer, "get_queue_service", return_value=mock_queue_service), \
+                patch.object(consumer, "handle_task", side_effect=handle_task):
+            worker = asyncio.create_task(consumer.run_worker(concurrency=2))
+            await asyncio.sleep(0.05)
+            os.kill(os.getpid(), signal.SIGTERM)
+            with pytest.raises(asyncio.CancelledError):
+                await worker
+
+        assert finished == ["p1"]
+        mock_queue_service.flush_acks.assert_awaited()
@@ -5,33 +5,43 @@ Comprehensive test suite for prediction endpoints.
 import pytest
 import asyncio
 import uuid
-from httpx import AsyncClient
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch, AsyncMock, MagicMock
 
 from app.main import app
-from app.services.prediction import prediction_service
-from app.services.queue import queue_service
 from app.models import PredictionStatus
 
 
+@pytest.fixture
+def anyio_backend():
+    """Run anyio-marked tests on asyncio only."""
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    """Create async test client, driving the app through its ASGI interface."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.fixture
+def mock_queue_service():
+    """Replace the queue service bound by the prediction routes."""
+    service = MagicMock()
+    service.enqueue_prediction = AsyncMock(return_value=True)
+    service.get_status_and_result = AsyncMock(return_value=(None, None))
+    with patch("app.routes.predict.queue_service", service):
+        yield service
+
+
 class TestPredictionEndpoints:
     """Test suite for prediction API endpoints."""
     
-    @pytest.fixture
-    def client(self):
-        """Create test client."""
-        return TestClient(app)
-    
-    @pytest.fixture
-    async def async_client(self):
-        """Create async test client."""
-        async with AsyncClient(app=app, base_url="http://test") as ac:
-            yield ac
-    
-    def test_sync_prediction_success(self, client):
+    @pytest.mark.anyio
+    async def test_sync_prediction_success(self, client):
         """Test successful synchronous prediction."""
-        response = client.post(
+        response = await client.post(
             "/predict",
             json={"input": "test input data"}
         )
@@ -43,19 +53,20 @@ class TestPredictionEndpoints:
         assert data["input"] == "test input data"
         assert data["result"].isdigit()
     
-    def test_sync_prediction_empty_input(self, client):
+    @pytest.mark.anyio
+    async def test_sync_prediction_empty_input(self, client):
         """Test synchronous prediction with empty input."""
-        response = client.post(
+        response = await client.post(
             "/predict",
             json={"input": ""}
         )
         
-        assert response.status_code == 400
-        assert "empty" in response.json()["detail"].lower()
+        assert response.status_code == 422  # Rejected by request validation
     
-    def test_async_prediction_acceptance(self, client):
+    @pytest.mark.anyio
+    async def test_async_prediction_acceptance(self, client, mock_queue_service):
         """Test asynchronous prediction acceptance."""
-        response = client.post(
+        response = await client.post(
             "/predict",
             json={"input": "test async input"},
             headers={"Async-Mode": "true"}
@@ -66,24 +77,77 @@ class TestPredictionEndpoints:
         assert "message" in data
         assert "prediction_id" in data
         assert "Processing asynchronously" in data["message"]
+        mock_queue_service.enqueue_prediction.assert_awaited_once_with(
+            data["prediction_id"], "test async input"
+        )
+    
+    @pytest.mark.anyio
+    async def test_async_endpoint_acceptance(self, client, mock_queue_service):
+        """Test dedicated asynchronous prediction endpoint."""
+        response = await client.post(
+            "/predict/async",
+            json={"input": "test async input"}
+        )
+        
+        assert response.status_code == 202
+        data = response.json()
+        assert "prediction_id" in data
+        assert "Processing asynchronously" in data["message"]
+    
+    @pytest.mark.anyio
+    async def test_concurrent_async_predictions(self, client, stub_queue_service):
+        """Test concurrent submissions and lookups through the real queue service and pools."""
+        n = 100
+        with patch("app.routes.predict.queue_service", stub_queue_service):
+            responses = await asyncio.gather(*(
+                client.post(
+                    "/predict",
+                    json={"input": f"concurrent input {i}"},
+                    headers={"Async-Mode": "true"}
+                )
+                for i in range(n)
+            ))
+            assert all(response.status_code == 202 for response in responses)
+            prediction_ids = {response.json()["prediction_id"] for response in responses}
+            assert len(prediction_ids) == n
+            
+            lookups = await asyncio.gather(*(
+                client.get(f"/predict/{prediction_id}") for prediction_id in prediction_ids
+            ))
+        
+        # Every prediction is found and still pending; none is a false 404
+        assert all(response.status_code == 400 for response in lookups)
+    
+    @pytest.mark.anyio
+    async def test_async_enqueue_failure(self, client, mock_queue_service):
+        """Test async submission when the task cannot be enqueued."""
+        mock_queue_service.enqueue_prediction.return_value = False
+        response = await client.post(
+            "/predict/async",
+            json={"input": "test async input"}
+        )
+        
+        assert response.status_code == 500
     
-    def test_get_prediction_not_found(self, client):
+    @pytest.mark.anyio
+    async def test_get_prediction_not_found(self, client, mock_queue_service):
         """Test getting result for non-existent prediction."""
         fake_id = str(uuid.uuid4())
-        response = client.get(f"/predict/{fake_id}")
+        response = await client.get(f"/predict/{fake_id}")
         
         assert response.status_code == 404
         assert "not found" in response.json()["error"].lower()
     
-    @patch('app.services.queue.queue_service.get_prediction_status')
-    @patch('app.services.queue.queue_service.get_prediction_result')
-    def test_get_prediction_completed(self, mock_get_result, mock_get_status, client):
+    @pytest.mark.anyio
+    async def test_get_prediction_completed(self, client, mock_queue_service):
         """Test getting completed prediction result."""
         prediction_id = str(uuid.uuid4())
-        mock_get_status.return_value = PredictionStatus.COMPLETED
-        mock_get_result.return_value = {"input": "test", "result": "1234"}
+        mock_queue_service.get_status_and_result.return_value = (
+            PredictionStatus.COMPLETED,
+            {"input": "test", "result": "1234"}
+        )
         
-        response = client.get(f"/predict/{prediction_id}")
+        response = await client.get(f"/predict/{prediction_id}")
         
         assert response.status_code == 200
         data = response.json()
@@ -91,20 +155,29 @@ class TestPredictionEndpoints:
         assert "output" in data
         assert data["status"] == "completed"
     
-    @patch('app.services.queue.queue_service.get_prediction_status')
-    def test_get_prediction_processing(self, mock_get_status, client):
+    @pytest.mark.anyio
+    async def test_get_prediction_processing(self, client, mock_queue_service):
         """Test getting result for processing prediction."""
         prediction_id = str(uuid.uuid4())
-        mock_get_status.return_value = PredictionStatus.PROCESSING
+        mock_queue_service.get_status_and_result.return_value = (PredictionStatus.PROCESSING, None)
         
-        response = client.get(f"/predict/{prediction_id}")
+        response = await client.get(f"/predict/{prediction_id}")
         
         assert response.status_code == 400
         assert "still being processed" in response.json()["error"]
     
-    def test_health_endpoint(self, client):
+    @pytest.mark.anyio
+    async def test_process_time_header(self, client):
+        """Test logged requests carry the processing time header."""
+        response = await client.get("/predict/invalid")
+        
+        assert float(response.headers["x-process-time"]) >= 0
+        assert response.headers["content-type"] == "application/json"
+    
+    @pytest.mark.anyio
+    async def test_health_endpoint(self, client):
         """Test health check endpoint."""
-        response = client.get("/health")
+        response = await client.get("/health")
         
         assert response.status_code == 200
         data = response.json()
@@ -112,9 +185,10 @@ class TestPredictionEndpoints:
         assert "services" in data
         assert "timestamp" in data
     
-    def test_metrics_endpoint(self, client):
+    @pytest.mark.anyio
+    async def test_metrics_endpoint(self, client):
         """Test metrics endpoint."""
-        response = client.get("/metrics")
+        response = await client.get("/metrics")
         
         assert response.status_code == 200
         data = response.json()
@@ -122,9 +196,10 @@ class TestPredictionEndpoints:
         assert "system" in data
         assert "timestamp" in data
     
-    def test_root_endpoint(self, client):
+    @pytest.mark.anyio
+    async def test_root_endpoint(self, client):
         """Test root endpoint."""
-        response = client.get("/")
+        response = await client.get("/")
         
         assert response.status_code == 200
         data = response.json()
@@ -135,54 +210,64 @@ class TestPredictionEndpoints:
 class TestAsyncFlow:
     """Test complete asynchronous prediction flow."""
     
-    @pytest.mark.asyncio
-    async def test_complete_async_flow(self):
+    @pytest.mark.anyio
+    async def test_complete_async_flow(self, client, mock_queue_service):
         """Test complete async prediction workflow."""
-        async with AsyncClient(app=app, base_url="http://test") as client:
-            # Submit async prediction
-            response = await client.post(
-                "/predict",
-                json={"input": "test async flow"},
-                headers={"Async-Mode": "true"}
-            )
-            
-            assert response.status_code == 202
-            prediction_id = response.json()["prediction_id"]
-            
-            # Wait a bit for processing to start
-            await asyncio.sleep(0.1)
-            
-            # Check status (should be pending or processing)
-            response = await client.get(f"/predict/{prediction_id}")
-            assert response.status_code in [400, 200]  # Processing or completed
+        mock_queue_service.get_status_and_result.return_value = (PredictionStatus.PENDING, None)
+        
+        # Submit async prediction
+        response = await client.post(
+            "/predict",
+            json={"input": "test async flow"},
+            headers={"Async-Mode": "true"}
+        )
+        
+        assert response.status_code == 202
+        prediction_id = response.json()["prediction_id"]
+        
+        # Wait a bit for processing to start
+        await asyncio.sleep(0.1)
+        
+        # Check status (should be pending or processing)
+        response = await client.get(f"/predict/{prediction_id}")
+        assert response.status_code in [400, 200]  # Processing or completed
+        mock_queue_service.get_status_and_result.assert_awaited_once_with(prediction_id)
 
 
 class TestEdgeCases:
     """Test edge cases and error conditions."""
     
-    @pytest.fixture
-    def client(self):
-        return TestClient(app)
-    
-    def test_invalid_prediction_id_format(self, client):
+    @pytest.mark.anyio
+    async def test_invalid_prediction_id_format(self, client):
         """Test invalid prediction ID format."""
-        response = client.get("/predict/invalid")
+        response = await client.get("/predict/invalid")
         assert response.status_code == 400
     
-    def test_very_long_input(self, client):
+    @pytest.mark.anyio
+    async def test_whitespace_only_input(self, client):
+        """Test with input that is empty after stripping whitespace."""
+        response = await client.post(
+            "/predict",
+            json={"input": "   "}
+        )
+        assert response.status_code == 422
+    
+    @pytest.mark.anyio
+    async def test_very_long_input(self, client):
         """Test with very long input."""
         long_input = "x" * 20000  # Exceeds max length
-        response = client.post(
+        response = await client.post(
             "/predict",
             json={"input": long_input}
         )
         assert response.status_code == 422  # Validation error
     
-    def test_malformed_json(self, client):
+    @pytest.mark.anyio
+    async def test_malformed_json(self, client):
         """Test with malformed JSON."""
-        response = client.post(
+        response = await client.post(
             "/predict",
-            data="invalid json",
+            content="invalid json",
             headers={"Content-Type": "application/json"}
         )
         assert response.status_code == 422
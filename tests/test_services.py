@@ -5,10 +5,12 @@ Test suite for service layer components.
 import pytest
 import asyncio
 import time
-from unittest.mock import patch, MagicMock
+import msgspec
+import redis
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from app.services.prediction import MockPredictionService
-from app.services.queue import RedisQueueService
+from app.services.queue import RedisQueueService, Task
 from app.models import PredictionStatus
 
 
@@ -65,57 +67,277 @@ class TestRedisQueueService:
     
     @pytest.fixture
     def mock_redis(self):
-        """Mock Redis client for testing."""
-        return MagicMock()
+        """Mock async Redis client for testing."""
+        return AsyncMock()
+    
+    @pytest.fixture
+    def mock_pipeline(self, mock_redis):
+        """Mock Redis pipeline returned by the client."""
+        pipe = MagicMock()
+        pipe.__aenter__.return_value = pipe
+        pipe.execute = AsyncMock()
+        mock_redis.pipeline = MagicMock(return_value=pipe)
+        return pipe
     
     @pytest.fixture
     def queue_service(self, mock_redis):
         """Queue service with mocked Redis."""
         service = RedisQueueService()
         service.redis_client = mock_redis
+        service.result_client = mock_redis
+        service.stream_client = mock_redis
+        service._store_script = AsyncMock(return_value=1)
         return service
     
-    def test_enqueue_prediction(self, queue_service, mock_redis):
+    @pytest.mark.asyncio
+    async def test_enqueue_prediction(self, queue_service, mock_pipeline):
         """Test prediction enqueueing."""
-        mock_redis.xadd.return_value = "test-stream-id"
-        mock_redis.setex.return_value = True
+        mock_pipeline.execute.return_value = [True, "test-stream-id"]
         
-        result = queue_service.enqueue_prediction("test-id", "test input")
+        result = await queue_service.enqueue_prediction("test-id", "test input")
         
         assert result is True
-        mock_redis.xadd.assert_called_once()
-        mock_redis.setex.assert_called()
+        mock_pipeline.xadd.assert_called_once()
+        mock_pipeline.setex.assert_called_once()
+        mock_pipeline.execute.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_consumer_group_created_lazily(self, queue_service, mock_redis, mock_pipeline):
+        """Test the consumer group is created on first use only."""
+        mock_pipeline.execute.return_value = [True, "test-stream-id"]
+        mock_redis.xgroup_create.assert_not_called()
+        
+        await queue_service.enqueue_prediction("a", "test input")
+        await queue_service.enqueue_prediction("b", "test input")
+        
+        mock_redis.xgroup_create.assert_awaited_once()
     
-    def test_store_and_get_result(self, queue_service, mock_redis):
+    @pytest.mark.asyncio
+    async def test_consumer_group_recreated_after_nogroup(self, queue_service, mock_redis):
+        """Test a NOGROUP read error makes the next read recreate the group."""
+        queue_service._group_ready = True
+        mock_redis.xreadgroup.side_effect = redis.exceptions.ResponseError("NOGROUP No such key")
+        
+        with patch("app.services.queue.asyncio.sleep", new_callable=AsyncMock):
+            await queue_service.get_next_tasks()
+        assert queue_service._group_ready is False
+        
+        mock_redis.xreadgroup.side_effect = None
+        mock_redis.xreadgroup.return_value = []
+        await queue_service.get_next_tasks()
+        mock_redis.xgroup_create.assert_awaited_once()
+        assert queue_service._group_ready is True
+    
+    @pytest.mark.asyncio
+    async def test_store_and_get_result(self, queue_service, mock_redis):
         """Test storing and retrieving prediction results."""
         test_result = {"input": "test", "result": "1234"}
         prediction_id = "test-prediction-id"
         
         # Mock successful storage
-        mock_redis.setex.return_value = True
-        result = queue_service.store_prediction_result(prediction_id, test_result)
+        result = await queue_service.store_prediction_result(prediction_id, test_result)
         assert result is True
+        call = queue_service._store_script.await_args
+        assert call.kwargs["keys"] == [queue_service._rkey(prediction_id), queue_service._skey(prediction_id)]
+        assert call.kwargs["args"][2] == "completed"
         
         # Mock successful retrieval
-        import json
-        mock_redis.get.return_value = json.dumps(test_result)
-        retrieved = queue_service.get_prediction_result(prediction_id)
+        mock_redis.get.return_value = msgspec.msgpack.encode(test_result)
+        retrieved = await queue_service.get_prediction_result(prediction_id)
         assert retrieved == test_result
     
-    def test_status_management(self, queue_service, mock_redis):
+    @pytest.mark.asyncio
+    async def test_status_management(self, queue_service, mock_redis):
         """Test prediction status management."""
         prediction_id = "test-status-id"
         
         # Test setting status
         mock_redis.setex.return_value = True
-        result = queue_service.set_prediction_status(prediction_id, PredictionStatus.PROCESSING)
+        result = await queue_service.set_prediction_status(prediction_id, PredictionStatus.PROCESSING)
         assert result is True
         
         # Test getting status
         mock_redis.get.return_value = "processing"
-        status = queue_service.get_prediction_status(prediction_id)
+        status = await queue_service.get_prediction_status(prediction_id)
         assert status == PredictionStatus.PROCESSING
 
+    @pytest.mark.asyncio
+    async def test_get_next_task_prefetch(self, queue_service, mock_redis):
+        """Test XREADGROUP asks for at most max_count and leftovers are served from the buffer."""
+        mock_redis.xreadgroup.return_value = [
+            (b"prediction_tasks", [
+                (f"{i}-0".encode(), {b"m": msgspec.msgpack.encode(Task(f"p{i}", "x", i))})
+                for i in range(3)
+            ])
+        ]
+        
+        first = await queue_service.get_next_tasks(max_count=2)
+        rest = await queue_service.get_next_tasks(max_count=5)
+        
+        assert [task.prediction_id for task in first] == ["p0", "p1"]
+        assert first[0].message_id == "0-0"
+        assert [task.message_id for task in rest] == ["2-0"]
+        mock_redis.xreadgroup.assert_awaited_once()
+        assert mock_redis.xreadgroup.await_args.kwargs["count"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_get_next_tasks_skips_malformed_entry(self, queue_service, mock_redis):
+        """Test one undecodable entry is acked and dropped without losing the rest."""
+        mock_redis.xreadgroup.return_value = [
+            (b"prediction_tasks", [
+                (b"1-0", {b"m": msgspec.msgpack.encode(Task("p1", "x", 1))}),
+                (b"2-0", {b"prediction_id": b"legacy"}),
+                (b"3-0", {b"m": msgspec.msgpack.encode(Task("p3", "x", 3))}),
+            ])
+        ]
+        
+        tasks = await queue_service.get_next_tasks()
+        
+        assert [task.prediction_id for task in tasks] == ["p1", "p3"]
+        assert queue_service._ack_buffer == ["2-0"]
+    
+    @pytest.mark.asyncio
+    async def test_get_next_tasks_backs_off_on_error(self, queue_service, mock_redis):
+        """Test failed reads sleep with exponential backoff and reset on success."""
+        mock_redis.xreadgroup.side_effect = redis.exceptions.ConnectionError("down")
+        
+        with patch("app.services.queue.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            assert await queue_service.get_next_tasks() == []
+            assert await queue_service.get_next_tasks() == []
+            assert [call.args[0] for call in mock_sleep.await_args_list] == [0.1, 0.2]
+            
+            mock_redis.xreadgroup.side_effect = None
+            mock_redis.xreadgroup.return_value = []
+            await queue_service.get_next_tasks()
+        assert queue_service._read_backoff == 0.1
+    
+    @pytest.mark.asyncio
+    async def test_acknowledge_task_batching(self, queue_service, mock_redis):
+        """Test acknowledgements are buffered and sent in one XACK."""
+        queue_service._ack_batch = 3
+        queue_service._claimed_ids.update({"1-0", "2-0", "3-0", "4-0"})
+        
+        await queue_service.acknowledge_task("1-0")
+        await queue_service.acknowledge_task("2-0")
+        mock_redis.xack.assert_not_awaited()
+        
+        await queue_service.acknowledge_task("3-0")
+        mock_redis.xack.assert_awaited_once_with(
+            queue_service.stream_name, queue_service.consumer_group, "1-0", "2-0", "3-0"
+        )
+        
+        # Partial batches are sent on an explicit flush
+        await queue_service.acknowledge_task("4-0")
+        assert await queue_service.flush_acks() is True
+        assert mock_redis.xack.await_count == 2
+        assert not queue_service._claimed_ids
+    
+    @pytest.mark.asyncio
+    async def test_reclaim_stale(self, queue_service, mock_redis):
+        """Test idle pending tasks are claimed into the prefetch buffer."""
+        mock_redis.xautoclaim.return_value = [
+            b"5-0",
+            [
+                (b"1-0", {b"m": msgspec.msgpack.encode(Task("p1", "x", 1))}),
+                (None, None),
+            ],
+            [],
+        ]
+        
+        reclaimed = await queue_service.reclaim_stale(min_idle_ms=1000)
+        
+        assert reclaimed == 1
+        assert mock_redis.xautoclaim.await_args.kwargs["start_id"] == b"0-0"
+        assert queue_service._reclaim_cursor == b"5-0"
+        task = await queue_service.get_next_task()
+        assert (task.prediction_id, task.message_id) == ("p1", "1-0")
+        mock_redis.xreadgroup.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_reclaim_stale_skips_held_and_malformed(self, queue_service, mock_redis):
+        """Test reclaim ignores tasks this consumer holds and acks undecodable ones."""
+        queue_service._claimed_ids.add("1-0")
+        mock_redis.xautoclaim.return_value = [
+            b"0-0",
+            [
+                (b"1-0", {b"m": msgspec.msgpack.encode(Task("p1", "x", 1))}),
+                (b"2-0", {b"prediction_id": b"legacy"}),
+                (b"3-0", {b"m": msgspec.msgpack.encode(Task("p3", "x", 3))}),
+            ],
+            [],
+        ]
+        
+        assert await queue_service.reclaim_stale() == 1
+        assert [task.prediction_id for task in queue_service._task_buffer] == ["p3"]
+        assert queue_service._ack_buffer == ["2-0"]
+        
+        # A non-empty buffer skips the reclaim entirely
+        assert await queue_service.reclaim_stale() == 0
+        mock_redis.xautoclaim.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_get_status_and_result(self, queue_service, mock_pipeline):
+        """Test fetching status and result in a single pipeline."""
+        mock_pipeline.execute.return_value = [b"completed", msgspec.msgpack.encode({"input": "test", "result": "1234"})]
+        
+        status, result = await queue_service.get_status_and_result("test-id")
+        
+        assert status == PredictionStatus.COMPLETED
+        assert result == {"input": "test", "result": "1234"}
+        assert mock_pipeline.get.call_count == 2
+        mock_pipeline.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_get_status_and_result_legacy_json(self, queue_service, mock_pipeline):
+        """Test results stored as JSON before the MessagePack switch still decode."""
+        mock_pipeline.execute.return_value = [b"completed", b'{"input": "test", "result": "1234"}']
+        
+        status, result = await queue_service.get_status_and_result("test-id")
+        
+        assert status == PredictionStatus.COMPLETED
+        assert result == {"input": "test", "result": "1234"}
+    
+    @pytest.mark.asyncio
+    async def test_completed_result_is_cached(self, queue_service, mock_pipeline):
+        """Test polling a completed prediction hits Redis only once."""
+        mock_pipeline.execute.return_value = [b"completed", msgspec.msgpack.encode({"input": "test", "result": "1234"})]
+        
+        first = await queue_service.get_status_and_result("cached-id")
+        second = await queue_service.get_status_and_result("cached-id")
+        
+        assert first == second == (PredictionStatus.COMPLETED, {"input": "test", "result": "1234"})
+        mock_pipeline.execute.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_pending_status_not_cached(self, queue_service, mock_redis):
+        """Test non-terminal statuses are always read from Redis."""
+        mock_redis.get.return_value = "pending"
+        
+        await queue_service.get_prediction_status("pending-id")
+        await queue_service.get_prediction_status("pending-id")
+        
+        assert mock_redis.get.await_count == 2
+
+
+class TestQueueServiceConcurrency:
+    """Concurrency tests for the queue service against stubbed Redis connections."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_pools(self, stub_queue_service):
+        """Test many concurrent calls all succeed on the shared connection pools."""
+        n = 100
+        enqueued = await asyncio.gather(*(
+            stub_queue_service.enqueue_prediction(f"p{i}", "test input") for i in range(n)
+        ))
+        statuses = await asyncio.gather(*(
+            stub_queue_service.get_status_and_result(f"p{i}") for i in range(n)
+        ))
+        healthy = await asyncio.gather(*(stub_queue_service.health_check() for _ in range(n)))
+        
+        assert all(enqueued)
+        assert statuses == [(PredictionStatus.PENDING, None)] * n
+        assert all(healthy)
+
 
 class TestIntegration:
     """Integration tests for service interactions."""